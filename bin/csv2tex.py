@@ -28,6 +28,8 @@ def commandline_parsing():
         choices=[ 'ERROR', 'WARNING', 'INFO', 'DEBUG' ],
         help='Set the debug level. default: %(default)s' )
     parser.add_argument('-c', '--config', help='Config file')
+    parser.add_argument('-j', '--processes', type=int, default=None,
+        help='Parse csv input in parallel with this number of processes (0 for all cores)')
     parser.add_argument('csv', help='input csv file')
     args = parser.parse_args()
     return args
@@ -39,7 +41,7 @@ def main():
     #table_cols = ["car"]
     table = TexTable(config=args.config)#, table_cols=table_cols)
     # read in csv file from database dump
-    table.read_csv(args.csv)
+    table.read_csv(args.csv, processes=args.processes)
     table.write_tex_file()
     table.write_pdf_file()
 
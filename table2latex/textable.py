@@ -1,11 +1,25 @@
 from __future__ import print_function
 
 import collections
+import gc
+import itertools
+import sys
 import subprocess
 import logging
 import imp
 import csv
 import re
+import io
+import os
+import locale
+import mmap
+import multiprocessing
+import gzip
+import bz2
+try:
+    import lzma
+except ImportError:
+    lzma = None
 
 import table2latex.rounding as rounding
 
@@ -20,6 +34,29 @@ LATEX_ESCAPE_RULES = {r"&": r"\&", r"%": r"\%", r"$": r"\$", r"#": r"\#",
                       r"~": r"\textasciitilde{}", "\\": r"\textbackslash{}",
                       r"<": r"\ensuremath{<}", r">": r"\ensuremath{>}"}
 
+# compression formats by file extension and magic bytes
+COMPRESSION_EXTENSIONS = {".gz": "gzip", ".bz2": "bz2", ".xz": "xz", ".lzma": "xz"}
+# bz2 magic includes the block size and the block or end of stream signature
+COMPRESSION_MAGIC = [(re.compile(b"\x1f\x8b"), "gzip"),
+                     (re.compile(b"BZh[1-9](1AY&SY|\x17\x72\x45\x38\x50\x90)"), "bz2"),
+                     (re.compile(b"\xfd7zXZ\x00"), "xz")]
+
+# latex commands and markup not contributing to the displayed text width
+TEX_MARKUP_REGEX = re.compile(r'\\[a-zA-Z]+\*?|\\(.)|[{}$^]')
+
+# approximate text width (cm) for the a4 geometry used in documents
+PAGE_WIDTH = 8 * 2.54
+LANDSCAPE_PAGE_WIDTH = 9 * 2.54
+# approximate average character width (cm) for normal and small font
+CHAR_WIDTH = 0.18
+LANDSCAPE_CHAR_WIDTH = 0.16
+# tabcolsep (cm) for default and landscape tables
+COL_SEP_WIDTH = 6 / 72.27 * 2.54
+LANDSCAPE_COL_SEP_WIDTH = 2 / 72.27 * 2.54
+
+# minimum number of bytes per range for parallel csv parsing
+MIN_CSV_RANGE_SIZE = 1 << 20
+
 # setup logging
 log = logging.getLogger('latextable-cli')
 
@@ -45,6 +82,219 @@ def escape_latex(text):
     regex = re.compile('|'.join(re.escape(unicode(key)) for key in sorted(conv.keys(), key = lambda item: - len(item))))
     return regex.sub(lambda match: conv[match.group()], text)
 
+def strip_compression_suffix(filename):
+    '''
+        :param filename: a file path
+        :return: the file path without a known compression extension
+    '''
+    for extension in COMPRESSION_EXTENSIONS:
+        if filename.endswith(extension):
+            return filename[:-len(extension)]
+    return filename
+
+def open_compressed_binary(filename, compression, mode, compresslevel=None):
+    '''
+        :param filename: path of a compressed file
+        :param compression: one of gzip, bz2 or xz
+        :param mode: "r" or "w"
+        :param compresslevel: compression level used for writing
+        :return: binary file object for the decompressed stream
+    '''
+    mode = mode.replace("t", "").replace("b", "")
+    level = {} if compresslevel is None or "r" in mode else {"compresslevel": compresslevel}
+    if compression == "gzip":
+        return gzip.GzipFile(filename, mode + "b", **level)
+    if compression == "bz2":
+        return bz2.BZ2File(filename, mode, **level)
+    if lzma is None:
+        raise RuntimeError("lzma module is required to open %s" % filename)
+    if level:
+        return lzma.LZMAFile(filename, mode, preset=compresslevel)
+    return lzma.LZMAFile(filename, mode)
+
+def detect_compression(filename):
+    '''
+        :param filename: path of a plain or compressed file
+        :return: compression format detected by magic bytes or None
+    '''
+    with open(filename, "rb") as raw_file:
+        start = raw_file.read(10)
+    for magic, compression in COMPRESSION_MAGIC:
+        if magic.match(start):
+            return compression
+    return None
+
+def open_file(filename, mode="r", compresslevel=None):
+    '''
+        :param filename: path of a plain or gzip/bz2/xz compressed file
+        :param mode: "r" or "w", files are always opened in text mode
+        :param compresslevel: compression level used for compressed output
+        :return: file object which transparently (de)compresses the stream.
+            Compression is detected by magic bytes for reading and by file
+            extension for writing.
+    '''
+    compression = None
+    if "r" in mode:
+        compression = detect_compression(filename)
+    else:
+        for extension, extension_compression in COMPRESSION_EXTENSIONS.items():
+            if filename.endswith(extension):
+                compression = extension_compression
+                break
+    if compression is None:
+        return open(filename, mode)
+    binary_file = open_compressed_binary(filename, compression, mode, compresslevel)
+    # Python 2 text files are byte strings like the binary stream
+    if sys.version_info[0] < 3:
+        return binary_file
+    # same encoding and newline handling as open in text mode
+    return io.TextIOWrapper(binary_file)
+
+def tex_display_length(tex):
+    '''
+        :param tex: a latex string
+        :return: approximate number of displayed characters
+    '''
+    return len(TEX_MARKUP_REGEX.sub(lambda match: match.group(1) or '', tex))
+
+def record_width(width_sketches, colkey, tex):
+    ''' Add the display length of a rendered cell to a width sketch '''
+    if width_sketches is None:
+        return
+    if colkey not in width_sketches:
+        width_sketches[colkey] = WidthSketch()
+    width_sketches[colkey].add(tex_display_length(tex))
+
+def convert_value(val):
+    '''
+        :param val: a raw (string) input value
+        :return: the value converted to int or float if possible
+    '''
+    try:
+        val = float(val)
+        valint = int(val)
+        if valint - val == 0:
+            val = valint
+    except:
+        pass
+    return val
+
+def quoted_field_end(mm, pos):
+    '''
+        :param mm: memory mapped (or bytes) csv content
+        :param pos: byte offset after the opening quote of a quoted field
+        :return: offset after the closing quote, escaped quotes ("") are
+            part of the field
+    '''
+    while True:
+        quote = mm.find(b'"', pos)
+        if quote == -1:
+            return len(mm)
+        if mm[quote + 1:quote + 2] != b'"':
+            return quote + 1
+        pos = quote + 2
+
+def next_record_boundary(mm, pos, target):
+    '''
+        :param mm: memory mapped (or bytes) csv content
+        :param pos: byte offset of a record start
+        :param target: minimal offset of the newline ending the record
+        :return: offset after the first newline at or after target which
+            is not part of a quoted field (or the content size). Like
+            csv.reader, a quote only opens a quoted field at the start of
+            a field and is a plain character otherwise.
+    '''
+    size = len(mm)
+    while True:
+        quote = mm.find(b'"', pos)
+        if quote == -1:
+            quote = size
+        # content between pos and quote is outside of quoted fields
+        start = max(pos, target)
+        if start < quote:
+            newline = mm.find(b'\n', start, quote)
+            if newline != -1:
+                return newline + 1
+        if quote == size:
+            return size
+        if quote == 0 or mm[quote - 1:quote] in (b',', b'\n', b'\r'):
+            pos = quoted_field_end(mm, quote + 1)
+        else:
+            pos = quote + 1
+
+def csv_record_boundaries(mm, range_size, start=0):
+    '''
+        :param mm: memory mapped (or bytes) csv content
+        :param range_size: approximate number of bytes per range
+        :param start: offset of the first record
+        :return: list of byte offsets splitting the content at record
+            boundaries. Quoted fields are skipped with the same quoting
+            rules as csv.reader, so newlines inside them never split ranges.
+    '''
+    size = len(mm)
+    boundaries = [start]
+    while boundaries[-1] + range_size < size:
+        boundary = next_record_boundary(mm, boundaries[-1], boundaries[-1] + range_size)
+        if boundary >= size:
+            break
+        boundaries.append(boundary)
+    if size > start:
+        boundaries.append(size)
+    return boundaries
+
+def csv_text_reader(data, encoding):
+    '''
+        :param data: bytes of complete csv records
+        :param encoding: text encoding of the data
+        :return: csv reader with the same newline handling as open in text mode
+    '''
+    return csv.reader(io.TextIOWrapper(io.BytesIO(data), encoding=encoding))
+
+def parse_csv_records(reader, header):
+    '''
+        :param reader: csv reader positioned after the header line
+        :param header: list of column keys
+        :return: list of record dicts with converted values
+    '''
+    headerdict = { j : key for j, key in enumerate( header ) }
+    return [{ headerdict[j]:convert_value(val) for j,val in enumerate(row)}
+            for row in reader]
+
+def parse_csv_range(args):
+    '''
+        :param args: tuple of filename, start and end byte offset, header
+            and text encoding
+        :return: tuple of the number of rows and one list of converted
+            values per header column, missing values are None
+    '''
+    filename, start, end, header, encoding = args
+    with open(filename, 'rb') as raw_file:
+        mm = mmap.mmap(raw_file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            data = mm[start:end]
+        finally:
+            mm.close()
+    ncols = len(header)
+    nrows = 0
+    columns = [[] for key in header]
+    # parsing creates many objects but no reference cycles
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for row in csv_text_reader(data, encoding):
+            # same error as parse_csv_records for fields without header
+            if len(row) > ncols:
+                raise KeyError(ncols)
+            for column, val in zip(columns, row):
+                column.append(convert_value(val))
+            for column in columns[len(row):]:
+                column.append(None)
+            nrows += 1
+    finally:
+        if gc_enabled:
+            gc.enable()
+    return nrows, columns
+
 class TexTableConfig(object):
     def __init__(self):
         self._table_cols = []
@@ -55,6 +305,8 @@ class TexTableConfig(object):
         self._col_func_map = {}
         self._col_merge_map = {}
         self._col_raw_list = []
+        self._col_aggregate_map = {}
+        self._total_aggregate_map = {}
         self._packages  = []
         self._replacements = TexReplacements()
     def add_package(self, package):
@@ -79,6 +331,12 @@ class TexTableConfig(object):
         self._col_raw_list.append(colkey)
     def add_column_merge_list(self, merge_list, colkey):
         self._col_merge_map[colkey] = merge_list
+    def add_column_aggregate(self, aggregate, colkey):
+        RunningAggregate.check_aggregate(aggregate, colkey)
+        self._col_aggregate_map.setdefault(colkey, []).append(aggregate)
+    def add_total_aggregate(self, aggregate, colkey):
+        RunningAggregate.check_aggregate(aggregate, colkey)
+        self._total_aggregate_map.setdefault(colkey, []).append(aggregate)
 
 
 class TexTable(object):
@@ -87,7 +345,12 @@ class TexTable(object):
                   row_list=[],
                   table_cols=[], # a list of column keys with all keys included in
                               # the tabsle
-                  sortkey = None, # column key used to sort table / group
+                  sortkey = None, # column key, list of keys / (key, order)
+                                  # tuples or TexSortSpec used to sort table
+                  sort_nulls = "last", # position of empty values: first or last
+                  sort_mixed = "numbers_first", # order of mixed type columns:
+                                                # numbers_first, strings_first
+                                                # or as_string
                   groupkey=None, # key used to group rows
                   group_func=None, # callback function to create group field based on row
                   hide_group = True, # Flag to control if grouping column should
@@ -103,48 +366,81 @@ class TexTable(object):
                   col_merge_map = {}, # map of colkeys to list of colkeys to mere
                                      # in single col
                   col_raw_list = [], # List of cols which should be displayed raw
+                  col_aggregate_map = {}, # map of colkeys to list of aggregates
+                                          # (sum, mean, min, max, count) added
+                                          # after each group
+                  total_aggregate_map = {}, # map of colkeys to list of aggregates
+                                            # added after the last group
                   chunksize = 1e9, # Number of entries before the table is
                                    # splitted in subtables
                   landscape = False, # Flag for landscape mode
-                  out = "outtable.tex", # output file
+                  out = "outtable.tex", # output file, compressed if it ends
+                                        # with .gz, .bz2 or .xz
+                  compresslevel = None, # compression level for compressed output
                   config = None, # path to python cofig file
+                  dataset = None, # shared TexDataset used as row source
                   significant_digits = 3,
+                  auto_width = False, # Flag to derive p{} column widths from
+                                      # rendered cell lengths
+                  auto_width_quantile = 0.9, # quantile of cell lengths used
+                                             # as column width
+                  page_width = None, # available width in cm for auto widths
                   **kwargs):
         # settings
         self.chunksize = chunksize
         self.landscape = landscape
         self.sortkey = sortkey
+        self.sort_nulls = sort_nulls
+        self.sort_mixed = sort_mixed
         self.groupkey = groupkey
         self.group_func = group_func
         self.hide_group = hide_group
         self.tablestyle = tablestyle
         self.packages = packages
         self.out = out
+        self.compresslevel = compresslevel
         self.row_group_separator = row_group_separator
         self.default_col_separator = default_col_separator
         self.significant_digits = significant_digits
+        self.auto_width = auto_width
+        self.auto_width_quantile = auto_width_quantile
+        self.page_width = page_width
         # fields
         self.tex = ""
 
         self._table_cols = table_cols
         self._header_relacement_maps = []
         self._col_width_map = {}
+        self._auto_col_width_map = {}
         self._col_separator_map = {}
         self._col_func_map = col_func_map
         self._col_merge_map = col_merge_map
         self._col_raw_list = col_raw_list
         self._group_order =  []
         self._col_func_map = {}
+        self._col_aggregate_map = col_aggregate_map
+        self._total_aggregate_map = total_aggregate_map
         self._replacements = TexReplacements()
         if config:
             self.read_config(config)
+        for aggregate_map in (self._col_aggregate_map, self._total_aggregate_map):
+            for colkey, aggregate_list in aggregate_map.items():
+                for aggregate in aggregate_list:
+                    RunningAggregate.check_aggregate(aggregate, colkey)
 
         # caching for dynamic fields
         self._group_row_dict = None
+        self._group_aggregates = None
+        self._total_aggregates = None
         self._table_chunks = None
         self._table_header = None
         # init code
-        self.rows = self.sort_rows( row_list )
+        self.dataset = None
+        self._dataset_state = None
+        if dataset is not None:
+            self.set_dataset(dataset)
+        else:
+            self.rows = self.sort_rows( row_list )
 
     def read_config(self, config):
         ''' Read config file objext (TexTableConfig) from file'''
@@ -159,6 +455,8 @@ class TexTable(object):
                          "col_func_map",
                          "col_merge_map",
                          "col_raw_list",
+                         "col_aggregate_map",
+                         "total_aggregate_map",
                          "replacements",
                         ]
         for at in private_attrs:
@@ -175,13 +473,22 @@ class TexTable(object):
         if getattr(config, attr_name):
             setattr(self, attr_name, getattr(config, attr_name))
 
+    @property
+    def sort_spec(self):
+        ''' Property for TexSortSpec created from sortkey or None '''
+        return TexSortSpec.create(self.sortkey,
+                                  nulls=self.sort_nulls,
+                                  mixed=self.sort_mixed)
+
     def sort_rows(self, row_list):
-        ''' Sort rows based on tables sort key '''
-        if not self.sortkey:
+        ''' Sort rows based on tables sort specification '''
+        sort_spec = self.sort_spec
+        if not sort_spec:
             return row_list
-        return sorted( row_list,
-                       key=lambda x: getattr( x, self.sortkey ),
-                       reverse=True )
+        index = sort_spec.sort_index(
+            lambda colkey: [getattr(row, colkey, None) for row in row_list],
+            len(row_list))
+        return [row_list[i] for i in index]
     @property
     def group_order(self):
         ''' property for ordered group values in list '''
@@ -197,6 +504,8 @@ class TexTable(object):
         ''' Get the column width for a given column key'''
         if colkey in self._col_width_map:
             return self._col_width_map[colkey]
+        elif colkey in self._auto_col_width_map:
+            return self._auto_col_width_map[colkey]
         else:
             return None
 
@@ -215,43 +524,161 @@ class TexTable(object):
 
     @property
     def group_row_dict(self):
-        ''' Property for dict of rows sorted by group attribute.'''
+        ''' Property for dict of rows sorted by group attribute.
+            Group and total aggregates are accumulated in the same pass.
+        '''
+        if self.dataset is not None and self._dataset_state != self.get_dataset_state():
+            # dataset or sort / group settings changed since rows were created
+            self.set_dataset(self.dataset)
         if not self._group_row_dict:
             self._group_row_dict = collections.OrderedDict()
-            for row in self.rows:
-                group = row.group
+            self._group_aggregates = {}
+            self._total_aggregates = self._new_aggregates(self._total_aggregate_map)
+            for group, row_list in self._iter_groups():
                 if not group in self._group_row_dict:
                     self._group_row_dict[ group ] = []
-                self._group_row_dict[ group ].append( row )
+                    self._group_aggregates[ group ] = self._new_aggregates(
+                        self._col_aggregate_map)
+                for row in row_list:
+                    self._group_row_dict[ group ].append( row )
+                    self._update_aggregates(self._group_aggregates[ group ], row)
+                    self._update_aggregates(self._total_aggregates, row)
             self._group_row_dict = collections.OrderedDict(
                  sorted( self._group_row_dict.items(),
                     key=lambda t: self.get_group_order_index(t[0])
                     ))
         return self._group_row_dict
 
+    def _iter_groups(self):
+        ''' Yield (group, row list) pairs in row order. The group index of a
+            shared dataset is reused if the rows were created from the
+            current dataset state and settings
+        '''
+        if (self.dataset is not None and self.group_func is None
+                and self._dataset_state == self.get_dataset_state()):
+            group_index = self.dataset.group_index(self.groupkey, self.sort_spec)
+            for group, positions in group_index.items():
+                yield group, [self.rows[pos] for pos in positions]
+            return
+        for row in self.rows:
+            yield row.group, [row]
+
+    @staticmethod
+    def _new_aggregates(aggregate_map):
+        ''' Create running aggregates for all columns in an aggregate map '''
+        return {colkey: RunningAggregate() for colkey in aggregate_map}
+
+    @staticmethod
+    def _update_aggregates(aggregates, row):
+        ''' Add the values of a single row to running aggregates '''
+        for colkey, aggregate in aggregates.items():
+            aggregate.add(getattr(row, colkey, None))
+
+    def get_aggregate_rows(self, aggregate_map, aggregates, label_prefix=""):
+        ''' Create one TexAggregateRow per requested aggregate function '''
+        aggregate_rows = []
+        for aggregate in RunningAggregate.LABELS:
+            values = {colkey: aggregates[colkey].value(aggregate)
+                      for colkey, aggregate_list in aggregate_map.items()
+                      if aggregate in aggregate_list}
+            # skip rows without any value, e.g. for groups without numbers
+            if all(value is None for value in values.values()):
+                continue
+            label = label_prefix + RunningAggregate.LABELS[aggregate]
+            aggregate_rows.append(TexAggregateRow(self.table_cols,
+                                                  values,
+                                                  label,
+                                                  significant_digits=self.significant_digits))
+        return aggregate_rows
+
     def get_table_chunks(self):
         ''' Split table into chunks bases on given chunksize'''
         table_chunks = []
         chunk = []
+        def add_to_chunk(row):
+            if len(chunk) == self.chunksize:
+                table_chunks.append( chunk[:] )
+                del chunk[:]
+            chunk.append( row )
         for group, row_list in self.group_row_dict.items():
             for i,row in enumerate(row_list):
                 row.first_in_group = not bool(i)
-                if len(chunk) == self.chunksize:
-                    table_chunks.append( chunk[:] )
-                    chunk = []
-                chunk.append( row )
+                add_to_chunk( row )
+            for row in self.get_aggregate_rows(self._col_aggregate_map,
+                                               self._group_aggregates[ group ]):
+                add_to_chunk( row )
+        total_rows = self.get_aggregate_rows(self._total_aggregate_map,
+                                             self._total_aggregates,
+                                             label_prefix="Total ")
+        for i,row in enumerate(total_rows):
+            if not i and self.row_group_separator != "newline":
+                row.separator = self.row_group_separator
+            add_to_chunk( row )
         table_chunks.append( chunk )
         return table_chunks
 
     def get_tex_table_chunks(self):
         ''' Return tex output for table chunks '''
         tex = ''
+        self._auto_col_width_map = {}
+        width_sketches = None
+        if self.auto_width:
+            # header cells define the minimal width of a column as well
+            width_sketches = {}
+            for line in self.header_replacement_maps:
+                for col in self.table_cols:
+                    record_width(width_sketches, col, line.get(col, ""))
         for chunk in self.get_table_chunks():
             tex += self.table_header
             for row in chunk:
-                tex += row.table_line + '\n'
+                tex += row.get_table_line(width_sketches) + '\n'
+        if self.auto_width:
+            self._auto_col_width_map = self.get_auto_col_widths(width_sketches)
         return tex
 
+    def get_auto_col_widths(self, width_sketches):
+        ''' Get map of column keys to widths (cm) which fit the page width.
+            Columns which fit in an equal share of the remaining width keep
+            their natural width (no p{} column). The remaining width is
+            distributed to wider columns relative to their quantile length.
+        '''
+        if self.landscape:
+            char_width, col_sep = LANDSCAPE_CHAR_WIDTH, LANDSCAPE_COL_SEP_WIDTH
+            page_width = self.page_width or LANDSCAPE_PAGE_WIDTH
+        else:
+            char_width, col_sep = CHAR_WIDTH, COL_SEP_WIDTH
+            page_width = self.page_width or PAGE_WIDTH
+        remaining = page_width - 2 * col_sep * len(self.table_cols)
+        flexible = {}
+        for col in self.table_cols:
+            colkey = self.groupkey if col == 'group' else col
+            if colkey in self._col_width_map:
+                remaining -= self._col_width_map[colkey]
+            elif col in width_sketches:
+                flexible[colkey] = width_sketches[col]
+        if remaining <= 0:
+            log.warning("Fixed column widths exceed the page width, "
+                        "no automatic column widths are used")
+            return {}
+        # fix columns which are narrower than their share of the width
+        fixed_any = True
+        while flexible and fixed_any:
+            fixed_any = False
+            share = remaining / len(flexible)
+            for colkey, sketch in list(flexible.items()):
+                natural = sketch.max * char_width
+                if natural <= share:
+                    remaining -= natural
+                    del flexible[colkey]
+                    fixed_any = True
+        if not flexible:
+            return {}
+        lengths = {colkey: max(sketch.quantile(self.auto_width_quantile), 1)
+                   for colkey, sketch in flexible.items()}
+        total_length = float(sum(lengths.values()))
+        return {colkey: remaining * length / total_length
+                for colkey, length in lengths.items()}
+
     def get_tex_table(self):
         ''' Create the actual latex code for this table object'''
         tex = self.get_tex_table_chunks()
@@ -302,18 +729,19 @@ class TexTable(object):
 
     def write_tex_file(self):
         ''' write table as document to pdf file '''
-        with open( self.out, "w") as tex_file:
+        with open_file( self.out, "w", self.compresslevel) as tex_file:
             tex_file.write(self.get_tex_table())
 
     def write_tex_document_file(self, path):
         ''' write table as document to pdf file '''
         doctex = self.apply_document_definition(self.get_tex_table())
-        with open( path, "w") as tex_file:
+        with open_file( path, "w", self.compresslevel) as tex_file:
             tex_file.write(doctex)
 
     def write_pdf_file(self):
         ''' write table as document to pdf file '''
-        path = self.out.replace('.tex','doc.tex')
+        # pdflatex needs an uncompressed document
+        path = strip_compression_suffix(self.out).replace('.tex','doc.tex')
         self.write_tex_document_file(path)
         p = subprocess.Popen("pdflatex %s" % path,
                       stdout=subprocess.PIPE,
@@ -323,54 +751,55 @@ class TexTable(object):
         if p.returncode != 0:
             raise RuntimeError("Failed to run pdflatex for created document %s" %self.out )
 
-    def read_csv(self, filename):
-        ''' Read samples from csv input'''
-        row_list = []
-        with open( filename, 'r') as csv_file:
-            reader = csv.reader( csv_file )
-            headerdict = {}
-            for i,row in enumerate(reader):
-                if i == 0 :
-                    headerdict = { j : key for j, key in enumerate( row ) }
-                    self.default_cols = headerdict.values()
-                    continue
-                rowdict = { headerdict[j]:val for j,val in enumerate(row)}
-                row = TexRow(self.table_cols,
-                             rowdict,
-                             groupkey=self.groupkey,
-                             group_func=self.group_func,
-                             hide_group=self.hide_group,
-                             replacements=self._replacements,
-                             row_group_separator=self.row_group_separator,
-                             col_func_map = self._col_func_map,
-                             col_merge_map = self._col_merge_map,
-                             col_raw_list = self._col_raw_list,
-                             significant_digits=self.significant_digits)
-
-                row_list.append( row )
-
-        # Use all columns if non were specified
-        #if not self.table_cols:
-        #    self.table_cols = self.default_cols
-        self.rows = self.sort_rows( row_list )
+    def read_csv(self, filename, processes=None):
+        ''' Read samples from csv input, parsed in parallel if processes
+            is set (0 for all cores)
+        '''
+        self.set_dataset(TexDataset.from_csv(filename, processes=processes))
+
+    def set_dataset(self, dataset):
+        ''' Use a (shared) TexDataset as row source. Rows are created as
+            views on the dataset records without copying the row data.
+        '''
+        self.dataset = dataset
+        self.default_cols = list(dataset.columns)
+        self.rows = [self._create_row(dataset.records[i], converted=True)
+                     for i in dataset.sort_index(self.sort_spec)]
+        self._dataset_state = self.get_dataset_state()
+        self._group_row_dict = None
+
+    def get_dataset_state(self):
+        ''' Get dataset version and settings the rows depend on '''
+        sort_spec = self.sort_spec
+        return (self.dataset.version,
+                sort_spec.cache_key if sort_spec else None,
+                self.groupkey)
+
+    def _create_row(self, row_dict, converted=False):
+        ''' Create a TexRow using the settings of this table '''
+        return TexRow(self.table_cols,
+                      row_dict,
+                      groupkey=self.groupkey,
+                      group_func=self.group_func,
+                      hide_group=self.hide_group,
+                      replacements=self._replacements,
+                      row_group_separator=self.row_group_separator,
+                      col_func_map = self._col_func_map,
+                      col_merge_map = self._col_merge_map,
+                      col_raw_list = self._col_raw_list,
+                      significant_digits=self.significant_digits,
+                      converted=converted)
 
     def add_row(self, tex_row):
         ''' Add a single TexRow object to the table '''
         self.rows = self.sort_rows( self.rows + [tex_row] )
+        # rows are no longer in sync with the dataset indices
+        self.dataset = None
+        self._dataset_state = None
+        self._group_row_dict = None
 
     def add_row_dict(self, row_dict):
-        row = TexRow(self.table_cols,
-                     row_dict,
-                     groupkey=self.groupkey,
-                     group_func=self.group_func,
-                     hide_group=self.hide_group,
-                     replacements=self._replacements,
-                     row_group_separator=self.row_group_separator,
-                     col_func_map = self._col_func_map,
-                     col_merge_map = self._col_merge_map,
-                     col_raw_list = self._col_raw_list,
-                     significant_digits=self.significant_digits)
-        self.add_row(row)
+        self.add_row(self._create_row(row_dict))
 
 
     def add_header_line(self, linedict):
@@ -455,10 +884,10 @@ class TexRow(object):
                   col_merge_map = {},
                   col_raw_list = [],
                   replacements=None,
-                  significant_digits=2 ):
+                  significant_digits=2,
+                  converted=False ):
         #settings
         self.rowkeys = rowkeys
-        self.rowdict = rowdict
         self.first_in_group = first_in_group
         self.hide_group = hide_group
         self.row_group_separator = row_group_separator
@@ -473,18 +902,17 @@ class TexRow(object):
             self._replacements = TexReplacements()
         self.groupkey = groupkey
         self.tex_replacement_map = {}
-        for key,val in rowdict.items():
-            if not hasattr(self, key):
-                try:
-                    val = float(val)
-                    valint = int(val)
-                    if valint - val == 0:
-                        val = valint
-                except:
-                    pass
-                setattr(self, key, val)
-            else:
-                print("Warning: key % used twice" % key)
+        # values are looked up in the (possibly shared) rowdict on access
+        if not converted:
+            rowdict = { key: convert_value(val) for key, val in rowdict.items() }
+        self.rowdict = rowdict
+
+    def __getattr__(self, key):
+        ''' Fall back to row values for unknown attributes '''
+        rowdict = self.__dict__.get('rowdict')
+        if rowdict is not None and key in rowdict:
+            return rowdict[key]
+        raise AttributeError(key)
     @property
     def group( self ):
         ''' Property for row group '''
@@ -537,6 +965,12 @@ class TexRow(object):
     @property
     def table_line( self ):
         ''' Get a single table line '''
+        return self.get_table_line()
+
+    def get_table_line( self, width_sketches=None ):
+        ''' Get a single table line and record the rendered cell lengths
+            in width_sketches (dict of colkey : WidthSketch) if passed
+        '''
         tex = ''
         if self.groupkey:
             if not self.hide_group:
@@ -546,10 +980,12 @@ class TexRow(object):
                     else:
                         tex = self.row_group_separator + "\n"
                     if self.groupkey in self._col_raw_list:
-                        tex+= '%s &' % self.group
+                        group_tex = '%s' % self.group
                     else:
-                        tex+= '%s &' % self._replacements.apply_replacement( self.group,
-                                                                             self.groupkey)
+                        group_tex = self._replacements.apply_replacement( self.group,
+                                                                          self.groupkey)
+                    record_width(width_sketches, 'group', group_tex)
+                    tex += group_tex + ' &'
                 else:
                     tex = '& '
         row_list = []
@@ -558,10 +994,358 @@ class TexRow(object):
             if key == self.groupkey or key =="group":
                 continue
             value = self.col_value(key)
+            record_width(width_sketches, key, value)
             row_list.append( value )
         return tex + " & ".join( row_list ) + '\\\\'
 
 
+class TexSortSpec(object):
+    ''' Sort specification with multiple keys, an order per key and a
+        policy for empty values and columns with mixed types.
+    '''
+    ORDERS = {"asc": False, "desc": True}
+    NULLS = ["first", "last"]
+    MIXED = ["numbers_first", "strings_first", "as_string"]
+
+    def __init__(self, keys, nulls="last", mixed="numbers_first"):
+        ''' keys is a list of column keys or (colkey, "asc"/"desc") tuples.
+            Plain column keys are sorted descending like a single sortkey.
+        '''
+        if nulls not in self.NULLS:
+            raise ValueError("Unknown null policy %s" % nulls)
+        if mixed not in self.MIXED:
+            raise ValueError("Unknown mixed type policy %s" % mixed)
+        self.keys = []
+        for key in keys:
+            if isinstance(key, (tuple, list)):
+                colkey, order = key
+            else:
+                colkey, order = key, "desc"
+            if order not in self.ORDERS:
+                raise ValueError("Unknown sort order %s for column %s" % (order, colkey))
+            self.keys.append((colkey, self.ORDERS[order]))
+        self.nulls = nulls
+        self.mixed = mixed
+
+    @classmethod
+    def create(cls, sortkey, nulls="last", mixed="numbers_first"):
+        ''' Create a sort spec from a sortkey, list of keys or existing spec '''
+        if not sortkey:
+            return None
+        if isinstance(sortkey, cls):
+            return sortkey
+        # a single tuple is one (colkey, order) pair
+        if isinstance(sortkey, list):
+            return cls(sortkey, nulls=nulls, mixed=mixed)
+        return cls([sortkey], nulls=nulls, mixed=mixed)
+
+    def __bool__(self):
+        return bool(self.keys)
+    __nonzero__ = __bool__
+
+    @property
+    def cache_key(self):
+        ''' Hashable representation of this specification '''
+        return (tuple(self.keys), self.nulls, self.mixed)
+
+    def _sort_key(self, value, descending):
+        ''' Map a value to a comparable tuple respecting the null and
+            mixed type policies
+        '''
+        # ranks are negated for descending keys to keep empty values and
+        # the mixed type order first / last independent of the direction
+        sign = -1 if descending else 1
+        if value is None or value == "":
+            null_rank = 1 if self.nulls == "last" else -1
+            return (sign * null_rank, 0, 0)
+        if self.mixed == "as_string":
+            return (0, 0, unicode(value))
+        is_number = isinstance(value, (int, float))
+        if self.mixed == "numbers_first":
+            return (0, sign * (0 if is_number else 1), value)
+        return (0, sign * (1 if is_number else 0), value)
+
+    def sort_index(self, column_values, length):
+        ''' Return stable sorted list of indices. column_values is a callable
+            returning the list of values for a column key. Sort keys are
+            extracted once per column and sorted from the least significant
+            key to the most significant one.
+        '''
+        index = list(range(length))
+        for colkey, descending in reversed(self.keys):
+            sort_keys = [self._sort_key(value, descending)
+                         for value in column_values(colkey)]
+            index.sort(key=sort_keys.__getitem__, reverse=descending)
+        return index
+
+
+class TexDataset(object):
+    ''' Parsed and type converted rows which can be shared by several
+        TexTable objects with different settings
+    '''
+    def __init__(self, records=None, columns=None):
+        self._records = records if records is not None else []
+        self.columns = columns if columns is not None else []
+        # header and column lists from parallel csv parsing, turned into
+        # records on first access
+        self._pending_columns = None
+        # cached indices shared by all tables using this dataset, version
+        # is increased whenever records change
+        self.version = 0
+        self._sort_index_cache = {}
+        self._group_index_cache = {}
+
+    @classmethod
+    def from_csv(cls, filename, processes=None):
+        ''' Create a dataset from csv input '''
+        dataset = cls()
+        if processes is None:
+            dataset.read_csv(filename)
+        else:
+            dataset.read_csv_parallel(filename, processes=processes)
+        return dataset
+
+    def read_csv(self, filename):
+        ''' Read samples from (compressed) csv input '''
+        with open_file( filename, 'r') as csv_file:
+            reader = csv.reader( csv_file )
+            self.columns = next(reader, [])
+            self.records.extend(parse_csv_records(reader, self.columns))
+        self._clear_cache()
+
+    def read_csv_parallel(self, filename, processes=0, range_size=None):
+        ''' Read samples from csv input using a process pool. The memory
+            mapped file is split into byte ranges at record boundaries which
+            are parsed to column buffers in the worker processes and merged
+            in file order. Record dicts are created on first access. processes=0 uses all available cores. Compressed input is
+            read sequentially.
+        '''
+        if detect_compression(filename):
+            log.warning("Compressed input %s is read sequentially" % filename)
+            return self.read_csv(filename)
+        size = os.path.getsize(filename)
+        if not size:
+            return self.read_csv(filename)
+        processes = processes or multiprocessing.cpu_count()
+        if range_size is None:
+            range_size = max(size // (4 * processes), MIN_CSV_RANGE_SIZE)
+        # same default encoding as open in text mode
+        encoding = locale.getpreferredencoding(False)
+        with open(filename, 'rb') as raw_file:
+            mm = mmap.mmap(raw_file.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                header_end = next_record_boundary(mm, 0, 0)
+                header = next(csv_text_reader(mm[:header_end], encoding), [])
+                boundaries = csv_record_boundaries(mm, range_size, header_end)
+            finally:
+                mm.close()
+        tasks = [(filename, start, end, header, encoding)
+                 for start, end in zip(boundaries[:-1], boundaries[1:])]
+        if len(tasks) <= 1 or processes == 1:
+            results = [parse_csv_range(task) for task in tasks]
+        else:
+            pool = multiprocessing.Pool(processes)
+            try:
+                results = pool.map(parse_csv_range, tasks, chunksize=1)
+            finally:
+                pool.close()
+                pool.join()
+        # merge column buffers of all ranges in file order
+        columns = [list(itertools.chain.from_iterable(range_columns[j]
+                                                      for nrows, range_columns in results))
+                   for j in range(len(header))]
+        if self._records or self._pending_columns is not None:
+            self.records.extend(self._columns_to_records(header, columns))
+        else:
+            self._pending_columns = (header, columns)
+        self.columns = list(header)
+        self._clear_cache()
+
+    @staticmethod
+    def _columns_to_records(header, columns):
+        ''' Create record dicts from column lists, None values are omitted '''
+        return [{ key: val for key, val in zip(header, values) if val is not None }
+                for values in zip(*columns)]
+
+    @property
+    def records(self):
+        ''' Property for list of record dicts '''
+        if self._pending_columns is not None:
+            header, columns = self._pending_columns
+            self._pending_columns = None
+            self._records.extend(self._columns_to_records(header, columns))
+        return self._records
+
+    def __len__(self):
+        if self._pending_columns is not None:
+            header, columns = self._pending_columns
+            return len(columns[0]) if columns else 0
+        return len(self._records)
+
+    def add_row_dict(self, row_dict):
+        ''' Add a single row from a dict of raw values '''
+        self.records.append({ key: convert_value(val) for key, val in row_dict.items() })
+        for key in row_dict:
+            if key not in self.columns:
+                self.columns.append(key)
+        self._clear_cache()
+
+    def _clear_cache(self):
+        self.version += 1
+        self._sort_index_cache = {}
+        self._group_index_cache = {}
+
+    def column(self, colkey):
+        ''' Return list of values for one column, None for missing values '''
+        if self._pending_columns is not None:
+            header, columns = self._pending_columns
+            if colkey in header:
+                return columns[header.index(colkey)]
+            return [None] * len(self)
+        return [record.get(colkey) for record in self._records]
+
+    def sort_index(self, sort_spec):
+        ''' Return list of record indices sorted by a TexSortSpec (or None) '''
+        cache_key = sort_spec.cache_key if sort_spec else None
+        if cache_key not in self._sort_index_cache:
+            if sort_spec:
+                index = sort_spec.sort_index(self.column, len(self))
+            else:
+                index = list(range(len(self)))
+            self._sort_index_cache[cache_key] = index
+        return self._sort_index_cache[cache_key]
+
+    def group_index(self, groupkey, sort_spec):
+        ''' Return OrderedDict of group values to positions in the sorted
+            record order
+        '''
+        cache_key = (groupkey, sort_spec.cache_key if sort_spec else None)
+        if cache_key not in self._group_index_cache:
+            index = collections.OrderedDict()
+            groups = self.column(groupkey) if groupkey else [None] * len(self)
+            for pos, i in enumerate(self.sort_index(sort_spec)):
+                index.setdefault(groups[i], []).append(pos)
+            self._group_index_cache[cache_key] = index
+        return self._group_index_cache[cache_key]
+
+
+class TexAggregateRow(object):
+    ''' Class representing a row of aggregated column values in a latex table '''
+    def __init__( self,
+                  rowkeys,
+                  aggregate_dict,
+                  label,
+                  separator = None,
+                  significant_digits=2 ):
+        self.rowkeys = rowkeys
+        self.aggregate_dict = aggregate_dict
+        self.label = label
+        self.separator = separator
+        self.first_in_group = False
+        self.rounding = rounding.rounding(sigdigits=significant_digits, negdigits=3, posdigits=2)
+
+    def col_value(self, colkey):
+        ''' Return rounded aggregate value for a column or empty string '''
+        value = self.aggregate_dict.get(colkey)
+        if value is None:
+            return ""
+        # counts are passed preformatted and skip rounding
+        if isinstance(value, str):
+            return value
+        return self.rounding.latex( value )
+
+    @property
+    def table_line( self ):
+        ''' Get a single table line '''
+        return self.get_table_line()
+
+    def get_table_line( self, width_sketches=None ):
+        ''' Get a single table line, the label is placed in the first
+            column (the group column if shown) in front of its aggregate
+            value if one is configured for this column
+        '''
+        row_list = [self.col_value(key) for key in self.rowkeys]
+        if row_list:
+            label = escape_latex(self.label)
+            if row_list[0]:
+                label += ": " + row_list[0]
+            row_list[0] = label
+        for key, value in zip(self.rowkeys, row_list):
+            record_width(width_sketches, key, value)
+        tex = self.separator + "\n" if self.separator else ''
+        return tex + " & ".join( row_list ) + '\\\\'
+
+
+class WidthSketch(object):
+    ''' Bounded memory histogram of cell lengths to estimate quantiles '''
+    def __init__(self, max_length=256):
+        self.max_length = max_length
+        self.counts = [0] * (max_length + 1)
+        self.count = 0
+        self.max = 0
+
+    def add(self, length):
+        ''' Add a single cell length, lengths above max_length are clipped '''
+        self.counts[min(length, self.max_length)] += 1
+        self.count += 1
+        self.max = max(self.max, length)
+
+    def quantile(self, q):
+        ''' Return the smallest length with at least q of all cells '''
+        target = q * self.count
+        cumulative = 0
+        for length, count in enumerate(self.counts):
+            cumulative += count
+            if count and cumulative >= target:
+                return length
+        return 0
+
+
+class RunningAggregate(object):
+    ''' Running accumulator for sum, mean, min, max and count of a column '''
+    LABELS = collections.OrderedDict([("sum", "Sum"),
+                                      ("mean", "Mean"),
+                                      ("min", "Min"),
+                                      ("max", "Max"),
+                                      ("count", "Count")])
+    def __init__(self):
+        self.count = 0
+        self.numeric_count = 0
+        self.sum = 0
+        self.min = None
+        self.max = None
+
+    @classmethod
+    def check_aggregate(cls, aggregate, colkey):
+        ''' Raise ValueError for unknown aggregate functions '''
+        if aggregate not in cls.LABELS:
+            raise ValueError("Unknown aggregate %s for column %s" % (aggregate, colkey))
+
+    def add(self, value):
+        ''' Add a single value, non numeric values are only counted '''
+        if value is None or value == "":
+            return
+        self.count += 1
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            return
+        self.numeric_count += 1
+        self.sum += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def value(self, aggregate):
+        ''' Return current value for an aggregate function, counts as string '''
+        if aggregate == "count":
+            return str(self.count)
+        if not self.numeric_count:
+            return None
+        if aggregate == "mean":
+            return float(self.sum) / self.numeric_count
+        return getattr(self, aggregate)
+
+
 class TexReplacements(object):
     ''' Class to manage tex replacemnts set in config files '''
     def __init__(self):
@@ -0,0 +1,71 @@
+import pytest
+
+from table2latex.textable import TexTable, TexTableConfig, TexAggregateRow, RunningAggregate
+
+
+def make_table(**kwargs):
+    config = TexTableConfig()
+    config.add_group_order(['g1', 'g2'])
+    table = TexTable(table_cols=['name', 'x'], config=config,
+                     significant_digits=2, **kwargs)
+    for name, x, group in [('a', 10, 'g1'), ('b', 30, 'g1'), ('c', 50, 'g2')]:
+        table.add_row_dict({'name': name, 'x': x, 'kind': group})
+    return table
+
+
+def test_running_aggregate():
+    aggregate = RunningAggregate()
+    for value in [2, 4.5, '', 'text', None, 1]:
+        aggregate.add(value)
+    assert aggregate.value('sum') == 7.5
+    assert aggregate.value('mean') == 2.5
+    assert aggregate.value('min') == 1
+    assert aggregate.value('max') == 4.5
+    assert aggregate.value('count') == '4'
+
+
+def test_group_and_total_rows_with_chunking():
+    table = make_table(groupkey='kind',
+                       col_aggregate_map={'x': ['sum']},
+                       total_aggregate_map={'x': ['mean', 'count']},
+                       chunksize=2)
+    chunks = table.get_table_chunks()
+    lines = [row.table_line for chunk in chunks for row in chunk]
+    assert [len(chunk) for chunk in chunks] == [2, 2, 2, 1]
+    assert lines[2] == 'Sum & 40\\\\'
+    assert lines[4] == 'Sum & 50\\\\'
+    assert lines[5] == '\\hline\nTotal Mean & 30\\\\'
+    assert lines[6] == 'Total Count & 3\\\\'
+
+
+def test_label_in_first_column():
+    row = TexAggregateRow(['x', 'y'], {'x': 30}, 'Sum', significant_digits=2)
+    assert row.table_line == 'Sum: 30 & \\\\'
+    row = TexAggregateRow(['x', 'y'], {'y': 30}, 'Sum', significant_digits=2)
+    assert row.table_line == 'Sum & 30\\\\'
+
+
+def test_label_in_visible_group_column():
+    row = TexAggregateRow(['group', 'x'], {'x': 30}, 'Sum', significant_digits=2)
+    assert row.table_line == 'Sum & 30\\\\'
+
+
+def test_unknown_aggregate():
+    with pytest.raises(ValueError):
+        make_table(col_aggregate_map={'x': ['median']})
+    with pytest.raises(ValueError):
+        make_table(total_aggregate_map={'x': ['median']})
+    config = TexTableConfig()
+    with pytest.raises(ValueError):
+        config.add_column_aggregate('median', 'x')
+    with pytest.raises(ValueError):
+        config.add_total_aggregate('median', 'x')
+
+
+def test_skip_rows_without_values():
+    table = make_table(total_aggregate_map={'name': ['sum', 'count']})
+    lines = [row.table_line for chunk in table.get_table_chunks() for row in chunk]
+    assert lines[-1] == '\\hline\nTotal Count: 3 & \\\\'
+    assert not any(line.startswith('Total Sum') for line in lines)
+    empty = TexTable(table_cols=['name', 'x'], total_aggregate_map={'x': ['sum']})
+    assert empty.get_table_chunks() == [[]]
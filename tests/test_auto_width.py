@@ -0,0 +1,106 @@
+import pytest
+
+import table2latex.textable as textable
+from table2latex.textable import TexTable, WidthSketch, tex_display_length
+
+
+def make_table(rows, **kwargs):
+    table = TexTable(table_cols=['short', 'text', 'long'], auto_width=True, **kwargs)
+    for short, text, long_text in rows:
+        table.add_row_dict({'short': short, 'text': text, 'long': long_text})
+    return table
+
+
+WIDE_ROWS = [('a', 'lorem ipsum ' * (i % 10 + 5), 'dolor sit amet ' * (i % 7 + 8))
+             for i in range(50)]
+
+
+def natural_width(table, col, char_width):
+    lengths = [tex_display_length(row.col_value(col)) for row in table.rows]
+    lengths.append(len(col))
+    return max(lengths) * char_width
+
+
+def test_sketch_quantiles():
+    sketch = WidthSketch()
+    for length in range(1, 11):
+        sketch.add(length)
+    assert sketch.quantile(0.5) == 5
+    assert sketch.quantile(0.9) == 9
+    assert sketch.quantile(1.0) == 10
+    assert sketch.quantile(0) == 1
+
+
+def test_sketch_clips_long_lengths():
+    sketch = WidthSketch()
+    sketch.add(10)
+    sketch.add(300)
+    sketch.add(1000)
+    assert sketch.max == 1000
+    assert sketch.quantile(1.0) == 256
+    assert sketch.quantile(0.3) == 10
+    assert len(sketch.counts) == 257
+
+
+def test_tex_display_length():
+    assert tex_display_length(r'dolor\_sit') == 9
+    assert tex_display_length(r'$2.00\cdot10^{3}$') == 7
+
+
+def test_narrow_columns_keep_l():
+    table = make_table([('a', 'b', 'c'), ('dd', 'ee', 'ff')])
+    tex = table.get_tex_table()
+    assert tex.startswith('\\begin{tabular}{|l |l |l|}')
+
+
+@pytest.mark.parametrize("landscape", [False, True])
+def test_widths_fill_page(landscape):
+    table = make_table(WIDE_ROWS, landscape=landscape)
+    tex = table.get_tex_table()
+    if landscape:
+        page, char_width, col_sep = (textable.LANDSCAPE_PAGE_WIDTH,
+                                     textable.LANDSCAPE_CHAR_WIDTH,
+                                     textable.LANDSCAPE_COL_SEP_WIDTH)
+    else:
+        page, char_width, col_sep = (textable.PAGE_WIDTH,
+                                     textable.CHAR_WIDTH,
+                                     textable.COL_SEP_WIDTH)
+    widths = table._auto_col_width_map
+    assert sorted(widths) == ['long', 'text']
+    assert 'p{%.3f cm}' % widths['long'] in tex
+    total = (sum(widths.values()) + natural_width(table, 'short', char_width)
+             + 2 * col_sep * 3)
+    assert total == pytest.approx(page)
+
+
+def test_header_is_measured():
+    table = make_table(WIDE_ROWS)
+    table.add_header_line({'short': 'a very long header for short values ' * 2})
+    table.get_tex_table()
+    widths = table._auto_col_width_map
+    assert sorted(widths) == ['long', 'short', 'text']
+
+
+def test_explicit_widths_take_precedence():
+    table = make_table(WIDE_ROWS)
+    table._col_width_map = {'long': 5.}
+    tex = table.get_tex_table()
+    assert 'p{5.000 cm}' in tex
+    assert 'long' not in table._auto_col_width_map
+    assert 'text' in table._auto_col_width_map
+
+
+def test_explicit_widths_exceeding_page():
+    table = make_table(WIDE_ROWS)
+    table._col_width_map = {'long': 25.}
+    tex = table.get_tex_table()
+    assert table._auto_col_width_map == {}
+    assert tex.startswith('\\begin{tabular}{|l |l |p{25.000 cm}|}')
+
+
+def test_widths_reset_without_auto_width():
+    table = make_table(WIDE_ROWS)
+    table.get_tex_table()
+    assert table._auto_col_width_map
+    table.auto_width = False
+    assert table.get_tex_table().startswith('\\begin{tabular}{|l |l |l|}')
@@ -0,0 +1,49 @@
+import pytest
+
+import table2latex.textable as textable
+from table2latex.textable import TexTable, TexDataset, open_file
+
+CSV = 'name,value\n"multi\nline",1\nplain,2.5\n'
+
+
+@pytest.mark.parametrize("extension", [".gz", ".bz2", ".xz"])
+def test_roundtrip(tmp_path, extension):
+    path = str(tmp_path / ("data.csv" + extension))
+    with open_file(path, "w", compresslevel=1) as out_file:
+        out_file.write(CSV)
+    with open(path, "rb") as raw_file:
+        assert raw_file.read() != CSV.encode()
+    dataset = TexDataset.from_csv(path)
+    assert dataset.records == [{'name': 'multi\nline', 'value': 1},
+                               {'name': 'plain', 'value': 2.5}]
+
+
+def test_plain_file_with_compression_extension(tmp_path):
+    path = str(tmp_path / "plain.csv.xz")
+    with open(path, "w") as out_file:
+        out_file.write(CSV)
+    assert len(TexDataset.from_csv(path).records) == 2
+
+
+def test_missing_lzma(tmp_path, monkeypatch):
+    path = str(tmp_path / "data.csv.xz")
+    with open_file(path, "w") as out_file:
+        out_file.write(CSV)
+    monkeypatch.setattr(textable, "lzma", None)
+    with pytest.raises(RuntimeError):
+        TexDataset.from_csv(path)
+
+
+def test_write_compressed_tex(tmp_path):
+    path = str(tmp_path / "table.tex.gz")
+    table = TexTable(table_cols=['name'], out=path)
+    table.add_row_dict({'name': 'first'})
+    table.write_tex_file()
+    with open_file(path) as tex_file:
+        assert tex_file.read() == table.get_tex_table()
+
+
+def test_plain_file_with_bz2_like_header(tmp_path):
+    path = tmp_path / "plain.csv"
+    path.write_bytes(b'BZhang,v\n1,2\n')
+    assert TexDataset.from_csv(str(path)).records == [{'BZhang': 1, 'v': 2}]
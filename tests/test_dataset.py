@@ -0,0 +1,54 @@
+from table2latex.textable import TexTable, TexDataset
+
+
+def make_dataset():
+    dataset = TexDataset(columns=['name', 'x', 'kind'])
+    for name, x, kind in [('a', 10, 'a'), ('b', 20, 'b'), ('c', 30, 'c'),
+                          ('d', 40, 'a')]:
+        dataset.add_row_dict({'name': name, 'x': x, 'kind': kind})
+    return dataset
+
+
+def group_names(table):
+    return {group: [row.name for row in rows]
+            for group, rows in table.group_row_dict.items()}
+
+
+def test_views_share_records_and_indices():
+    dataset = make_dataset()
+    first = TexTable(dataset=dataset, table_cols=['name', 'x'], sortkey='x')
+    second = TexTable(dataset=dataset, table_cols=['name'], sortkey='x')
+    assert [row.name for row in first.rows] == ['d', 'c', 'b', 'a']
+    assert first.rows[0].rowdict is second.rows[0].rowdict
+    assert first.rows[0].rowdict is dataset.records[3]
+    first.get_tex_table()
+    second.get_tex_table()
+    assert len(dataset._sort_index_cache) == 1
+
+
+def test_view_after_dataset_add_row_dict():
+    dataset = make_dataset()
+    table = TexTable(dataset=dataset, table_cols=['name', 'x'],
+                     sortkey='x', groupkey='kind')
+    table.get_tex_table()
+    dataset.add_row_dict({'name': 'e', 'x': '5', 'kind': 'b'})
+    assert 'e & 5.00\\\\' in table.get_tex_table()
+    assert group_names(table) == {'a': ['d', 'a'], 'b': ['b', 'e'], 'c': ['c']}
+
+
+def test_view_after_sortkey_change():
+    dataset = make_dataset()
+    table = TexTable(dataset=dataset, table_cols=['name', 'x'],
+                     sortkey='x', groupkey='kind')
+    assert group_names(table)['a'] == ['d', 'a']
+    table.sortkey = [('x', 'asc')]
+    assert group_names(table) == {'a': ['a', 'd'], 'b': ['b'], 'c': ['c']}
+
+
+def test_view_after_add_row():
+    dataset = make_dataset()
+    table = TexTable(dataset=dataset, table_cols=['name', 'x'],
+                     sortkey='x', groupkey='kind')
+    table.add_row_dict({'name': 'f', 'x': 50, 'kind': 'c'})
+    assert group_names(table)['c'] == ['f', 'c']
+    assert len(dataset.records) == 4
@@ -0,0 +1,88 @@
+import pytest
+
+from table2latex.textable import TexDataset, TexSortSpec, csv_record_boundaries
+
+ROWS = [
+    b'name,desc,value',
+    b'first,"quoted\r\nnewline",1',
+    b'second,"with ""quotes"", and\nnewlines\n",2.5',
+    b'third,plain,',
+    b'"fourth\nname","",4',
+    b'fifth,"\xc3\xa4 umlaut",5',
+    b'5" screen,"a"b"c d",6',
+    b'a""b,"x""\n""y",7',
+]
+
+
+@pytest.fixture
+def csv_path(tmp_path):
+    path = tmp_path / "data.csv"
+    path.write_bytes(b'\r\n'.join(ROWS + ROWS[1:] * 20) + b'\r\n')
+    return str(path)
+
+
+def test_boundaries_at_record_starts():
+    content = b'\n'.join(ROWS) + b'\n'
+    record_starts = set([0])
+    pos = 0
+    for row in ROWS:
+        pos += len(row) + 1
+        record_starts.add(pos)
+    for range_size in range(1, len(content) + 1):
+        boundaries = csv_record_boundaries(content, range_size)
+        assert boundaries[-1] == len(content)
+        assert boundaries == sorted(set(boundaries))
+        assert set(boundaries) <= record_starts
+
+
+def test_boundaries_with_long_quoted_field():
+    quoted = b'"' + b'x\n' * 100000 + b'"'
+    content = b'a\n' + quoted + b'\nb\n'
+    boundaries = csv_record_boundaries(content, 10)
+    assert boundaries == [0, len(content) - 2, len(content)]
+
+
+@pytest.mark.parametrize("processes", [1, 2])
+@pytest.mark.parametrize("range_size", [1, 7, 64, 1 << 20])
+def test_parallel_equals_sequential(csv_path, processes, range_size):
+    sequential = TexDataset.from_csv(csv_path)
+    parallel = TexDataset()
+    parallel.read_csv_parallel(csv_path, processes=processes, range_size=range_size)
+    assert parallel.columns == sequential.columns == ['name', 'desc', 'value']
+    assert parallel.records == sequential.records
+    assert len(parallel.records) == 147
+    assert parallel.records[0]['desc'] == 'quoted\nnewline'
+
+
+def test_empty_file(tmp_path):
+    path = tmp_path / "empty.csv"
+    path.write_bytes(b'')
+    dataset = TexDataset()
+    dataset.read_csv_parallel(str(path), processes=2)
+    assert dataset.records == []
+
+
+@pytest.mark.parametrize("range_size", [1, 3, 7, 20])
+def test_quotes_inside_unquoted_fields(tmp_path, range_size):
+    path = tmp_path / "inch.csv"
+    path.write_bytes(b'name,v\n' + b'5" screen,1\n"multi\nline",2\n' * 50)
+    sequential = TexDataset.from_csv(str(path))
+    parallel = TexDataset()
+    parallel.read_csv_parallel(str(path), processes=1, range_size=range_size)
+    assert len(sequential.records) == 100
+    assert parallel.records == sequential.records
+
+
+def test_records_created_lazily(csv_path):
+    sequential = TexDataset.from_csv(csv_path)
+    parallel = TexDataset()
+    parallel.read_csv_parallel(csv_path, processes=1, range_size=64)
+    spec = TexSortSpec.create([('value', 'asc'), ('name', 'asc')])
+    assert parallel.sort_index(spec) == sequential.sort_index(spec)
+    assert parallel.group_index('name', spec) == sequential.group_index('name', spec)
+    assert parallel._pending_columns is not None
+    assert len(parallel) == len(sequential.records)
+    assert parallel.records == sequential.records
+    assert parallel._pending_columns is None
+    parallel.read_csv_parallel(csv_path, processes=1)
+    assert parallel.records == sequential.records * 2
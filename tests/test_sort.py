@@ -0,0 +1,45 @@
+import pytest
+
+from table2latex.textable import TexTable, TexSortSpec, convert_value
+
+VALUES = [convert_value(val) for val in ['5', 'a', '10', '', 'b', '2']]
+
+
+def sort_values(keys, **kwargs):
+    spec = TexSortSpec(keys, **kwargs)
+    index = spec.sort_index(lambda colkey: VALUES, len(VALUES))
+    return [VALUES[i] for i in index]
+
+
+@pytest.mark.parametrize("order, nulls, mixed, expected", [
+    ("asc", "last", "numbers_first", [2, 5, 10, 'a', 'b', '']),
+    ("desc", "last", "numbers_first", [10, 5, 2, 'b', 'a', '']),
+    ("asc", "first", "numbers_first", ['', 2, 5, 10, 'a', 'b']),
+    ("desc", "first", "numbers_first", ['', 10, 5, 2, 'b', 'a']),
+    ("asc", "last", "strings_first", ['a', 'b', 2, 5, 10, '']),
+    ("desc", "last", "strings_first", ['b', 'a', 10, 5, 2, '']),
+    ("asc", "last", "as_string", [10, 2, 5, 'a', 'b', '']),
+    ("desc", "first", "as_string", ['', 'b', 'a', 5, 2, 10]),
+])
+def test_sort_policies(order, nulls, mixed, expected):
+    assert sort_values([("x", order)], nulls=nulls, mixed=mixed) == expected
+
+
+def test_plain_key_is_descending():
+    assert sort_values(["x"]) == [10, 5, 2, 'b', 'a', '']
+
+
+def test_multi_key_stable_sort():
+    table = TexTable(table_cols=['name'],
+                     sortkey=[('year', 'asc'), ('value', 'desc')])
+    for name, year, value in [('a', 2000, 1), ('b', 1999, 1), ('c', 2000, 3),
+                              ('d', 2000, 3), ('e', 1999, 2)]:
+        table.add_row_dict({'name': name, 'year': year, 'value': value})
+    assert [row.name for row in table.rows] == ['e', 'b', 'c', 'd', 'a']
+
+
+def test_invalid_policy():
+    with pytest.raises(ValueError):
+        TexSortSpec(["x"], nulls="middle")
+    with pytest.raises(ValueError):
+        TexSortSpec([("x", "up")])